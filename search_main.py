@@ -3,30 +3,119 @@
 # Usage:
 #   python playwright_search_contracts_fixed.py input.csv
 #   python playwright_search_contracts_fixed.py input.csv --output contracts_with_status.csv --headless --column company_name
+#   python playwright_search_contracts_fixed.py input.csv --headless --workers 4 --concurrency 4
 #
-# Requirements: pandas, playwright
-# pip install pandas playwright
+# Requirements: pandas, playwright, httpx
+# pip install pandas playwright "httpx[http2]"
 # python -m playwright install
+#
+# Names are answered through the USASpending JSON API first, replaying the search
+# request the SPA sends (captured once into usaspending_count_payload.json); the
+# browser is only used for names the API couldn't answer (or for everything with
+# --browser-only).
 
+import os
+import json
 import time
+import queue
+import shlex
+import sqlite3
+import threading
+import asyncio
 import argparse
 import signal
+import multiprocessing
+import multiprocessing.util
 from pathlib import Path
+from urllib.parse import urlsplit
 
+import httpx
 import pandas as pd
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]"); plain HTTP/1.1 works without it
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 URL = "https://www.usaspending.gov/search?hash=924356742dd57817f0e9197e858e75cd"
 
+# Backend endpoint the search SPA uses for its per-award-type result counts
+API_URL = "https://api.usaspending.gov/api/v2/search/spending_by_award_count/"
+API_COUNT_PATH = "/api/v2/search/spending_by_award_count"
+API_MAX_CONNECTIONS = 50
+API_RETRIES = 3
+
+# The SPA's own counts request (filters from the URL hash + the typed name), captured once
+# through the browser and replayed for every name so API and browser answers agree
+PAYLOAD_FILE = Path("usaspending_count_payload.json")
+
 # Selectors:
 INPUT_SELECTOR = "#search"
 SUBMIT_SELECTOR = 'button[aria-label="Click to submit your search."]'
 RESULT_LABEL_SELECTOR = 'span.filter__dropdown-label'        # expected "Prime Award Results"
 NO_RESULTS_SELECTOR = 'p.new-search__no-results-text'        # expected "No results found..."
 
+# Request filtering: only the document, scripts and API calls matter for the result check
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}
+BLOCKED_URL_PARTS = ("google-analytics", "googletagmanager", "doubleclick", "/collect?")
+ALLOWED_HOST_SUFFIXES = ("usaspending.gov",)
+
+# Chromium flags that trim startup work and background processes irrelevant to headless scraping
+CHROMIUM_ARGS = [
+    "--no-zygote",
+    "--no-sandbox",
+    "--disable-gpu",
+    "--disable-dev-shm-usage",
+    "--disable-accelerated-2d-canvas",
+    "--disable-mipmap-generation",
+    "--disable-partial-raster",
+    "--no-first-run",
+    "--disable-features=IsolateOrigins,site-per-process",
+    "--disable-background-networking",
+    "--disable-renderer-backgrounding",
+    "--disable-ipc-flooding-protection",
+]
+
+# Cookies/localStorage captured after the first successful load, reused by every new context
+STATE_FILE = Path("usaspending_state.json")
+
+# Total wall-clock budget for one row (context recycle, page load, search and reset);
+# every Playwright wait draws from what's left
+ROW_BUDGET_SECONDS = 30
+
+# Rewrite the output CSV every N processed rows instead of after each one
+FLUSH_EVERY = 50
+
+# Replace a tab's browser context after this many searches to keep memory flat
+CONTEXT_RECYCLE = 25
+
+# Status for a search that failed (navigation error, timeout, ...) rather than answered.
+# It is written to the CSV as "False" but never cached, so a later run searches the name again.
+UNDETERMINED = None
+
 # Interrupt flag so we can save on Ctrl+C
 interrupted = False
 
+# After an interrupt, how long workers get to finish their current row before being killed
+INTERRUPT_GRACE_SECONDS = ROW_BUDGET_SECONDS + 15
+
+# Split rows into chunks of at most this size so idle workers can pick up more work
+CHUNK_SIZE = 100
+
+# Per-worker queue used to stream (idx, status) results back to the parent as they finish
+_result_queue = None
+
+# Per-worker state kept alive between pool tasks (see _init_worker)
+_worker_loop = None
+_playwright = None
+_browser = None
+_worker_tabs = []
+_state_saved = False
+_launch_error = None
+
 
 def _signal_handler(signum, frame):
     global interrupted
@@ -34,161 +123,747 @@ def _signal_handler(signum, frame):
     print("\n⚠️  Received interrupt signal — will stop after current row and save progress...")
 
 
-def run(input_csv: Path, output_csv: Path, column: str, headless: bool, browser_name: str):
-    global interrupted
+def _init_worker(result_queue, headless: bool, browser_name: str, chrome_args=None):
+    """Pool initializer: launch this worker's browser once and keep it warm between tasks.
 
-    # Load CSV
-    df = pd.read_csv(input_csv, dtype=str)
-    if column not in df.columns:
-        raise RuntimeError(f"CSV must contain a '{column}' column (columns found: {list(df.columns)})")
+    Only SIGINT is trapped (through the event loop) so Ctrl+C lets in-flight searches
+    finish; SIGTERM keeps its default so Pool.terminate() can still stop the worker.
+    """
+    global _result_queue, _worker_loop, _launch_error
+    _result_queue = result_queue
 
-    # Ensure a status column exists
-    if "status" not in df.columns:
-        df["status"] = ""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    _worker_loop.add_signal_handler(signal.SIGINT, _signal_handler, signal.SIGINT, None)
 
-    # register signal handler for graceful shutdown
-    signal.signal(signal.SIGINT, _signal_handler)
-    signal.signal(signal.SIGTERM, _signal_handler)
+    # atexit does not fire in pool workers; Finalize runs when the worker exits normally
+    multiprocessing.util.Finalize(None, _close_worker, exitpriority=10)
 
-    with sync_playwright() as p:
-        browser_launcher = {
-            "chromium": p.chromium,
-            "firefox": p.firefox,
-            "webkit": p.webkit
-        }.get(browser_name.lower(), p.chromium)
+    # Raising here would make the pool respawn crashing workers forever; report to the parent instead
+    try:
+        _worker_loop.run_until_complete(_start_worker_browser(headless, browser_name, chrome_args))
+    except Exception as e:
+        _launch_error = f"{type(e).__name__}: {e}"
+        result_queue.put((None, _launch_error))
+
+
+def _save_csv(df: pd.DataFrame, output_csv: Path):
+    """Write df to a temp file next to output_csv and atomically swap it in."""
+    tmp_path = output_csv.with_suffix(output_csv.suffix + ".tmp")
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, output_csv)
 
-        browser = browser_launcher.launch(headless=headless)
-        context = browser.new_context()
-        page = context.new_page()
 
+def _csv_writer(snapshots: queue.Queue, output_csv: Path):
+    """Background thread: write queued DataFrame snapshots until a None sentinel arrives."""
+    while True:
+        snapshot = snapshots.get()
         try:
-            for idx, row in df.iterrows():
-                if interrupted:
-                    print("Stopping loop due to interrupt request.")
-                    break
+            if snapshot is None:
+                return
+            _save_csv(snapshot, output_csv)
+        except Exception as e:
+            print(f"  ❗ Failed to save CSV: {e}")
+        finally:
+            snapshots.task_done()
 
-                company = str(row.get(column) or "").strip()
-                if not company:
-                    df.loc[idx, "status"] = "False"
-                    print(f"[{idx}] empty {column!r} -> False (saved)")
-                    df.to_csv(output_csv, index=False)
-                    continue
 
-                print(f"[{idx}] Searching: {company!r}")
+def _host_allowed(host: str) -> bool:
+    """True for an allowed domain itself or its subdomains (not look-alikes such as evilusaspending.gov)."""
+    return any(host == suffix or host.endswith("." + suffix) for suffix in ALLOWED_HOST_SUFFIXES)
 
-                # Navigate (use networkidle to let SPA finish background loading)
-                try:
-                    page.goto(URL, wait_until="networkidle", timeout=450000)
-                except PlaywrightTimeoutError:
-                    # fallback
-                    print("  ⚠️ networkidle timeout; retrying with domcontentloaded")
-                    page.goto(URL, wait_until="domcontentloaded", timeout=60000)
-                except Exception as e:
-                    print(f"  ❗ Unexpected navigation error: {e} -> marking False")
-                    df.loc[idx, "status"] = "False"
-                    df.to_csv(output_csv, index=False)
-                    continue
 
-                # Wait for input
-                try:
-                    page.wait_for_selector(INPUT_SELECTOR, timeout=70000)
-                except PlaywrightTimeoutError:
-                    print("  ⚠️ Search input not found on page; marking False")
-                    df.loc[idx, "status"] = "False"
-                    df.to_csv(output_csv, index=False)
-                    continue
-
-                # Fill the input (more reliable than clipboard)
-                try:
-                    page.fill(INPUT_SELECTOR, company, timeout=5000)
-                except Exception:
-                    # fallback: focus + type
-                    try:
-                        page.click(INPUT_SELECTOR, timeout=3000)
-                    except Exception:
-                        try:
-                            page.focus(INPUT_SELECTOR)
-                        except Exception:
-                            pass
-                    # select-all then type
-                    try:
-                        page.keyboard.press("Control+A")
-                    except Exception:
-                        # mac users might need Meta
-                        try:
-                            page.keyboard.press("Meta+A")
-                        except Exception:
-                            pass
-                    page.keyboard.type(company, delay=30)
-
-                # short pause for SPA to register the change
-                time.sleep(0.2)
-
-                # Press Enter to reveal the Submit button (per page behavior)
-                try:
-                    page.keyboard.press("Enter")
-                except Exception:
-                    pass
+async def _route_request(route):
+    """Abort assets and third-party requests that don't affect the search result."""
+    request = route.request
+    host = urlsplit(request.url).hostname or ""
+    if (request.resource_type in BLOCKED_RESOURCE_TYPES
+            or any(part in request.url for part in BLOCKED_URL_PARTS)
+            or not _host_allowed(host)):
+        await route.abort()
+    else:
+        await route.continue_()
 
-                # If Submit appears, click it; otherwise assume Enter triggered results directly
-                try:
-                    page.wait_for_selector(SUBMIT_SELECTOR, timeout=6000)
-                    try:
-                        page.click(SUBMIT_SELECTOR, timeout=8000)
-                        print("  🔘 Submit clicked.")
-                    except PlaywrightTimeoutError:
-                        print("  ⚠️ Submit appeared but wasn't clickable.")
-                except PlaywrightTimeoutError:
-                    print("  ℹ️ Submit did not appear after Enter (maybe results loaded directly).")
-
-                # Wait for either success or no-results
-                status_value = "False"
-                try:
-                    page.wait_for_selector(RESULT_LABEL_SELECTOR, timeout=10000)
-                    # verify text
-                    try:
-                        label_text = page.locator(RESULT_LABEL_SELECTOR).inner_text(timeout=2000).strip()
-                    except Exception:
-                        label_text = ""
-                    if "Prime Award Results" in label_text:
-                        status_value = "True"
-                        print("  ✅ Results found -> True")
-                    else:
-                        print(f"  ℹ️ Results label found but text != 'Prime Award Results' ({label_text!r}) -> False")
-                        status_value = "False"
-                except PlaywrightTimeoutError:
-                    # check explicit no-results
-                    try:
-                        page.wait_for_selector(NO_RESULTS_SELECTOR, timeout=3000)
-                        status_value = "False"
-                        print("  ❌ No results message -> False")
-                    except PlaywrightTimeoutError:
-                        print("  ⚠️ Neither result-label nor no-results detected -> False")
-                        status_value = "False"
-                except Exception as e:
-                    print(f"  ❗ Unexpected error while checking results: {e} -> False")
-                    status_value = "False"
 
-                # Save status back to dataframe and flush to disk immediately
-                df.loc[idx, "status"] = status_value
-                try:
-                    df.to_csv(output_csv, index=False)
-                except Exception as e:
-                    print(f"  ❗ Failed to save CSV after row {idx}: {e}")
+async def _new_context(browser):
+    """Create a browser context with request blocking installed, warmed from STATE_FILE if present."""
+    context = None
+    if STATE_FILE.exists():
+        try:
+            context = await browser.new_context(storage_state=str(STATE_FILE))
+        except Exception as e:
+            print(f"  ⚠️ Ignoring unreadable {STATE_FILE}: {e}")
+    if context is None:
+        context = await browser.new_context()
+    await context.route("**/*", _route_request)
+    return context
+
+
+async def _save_storage_state(context):
+    """Snapshot cookies/localStorage to STATE_FILE once per worker (atomically, since workers may race)."""
+    global _state_saved
+    if _state_saved:
+        return
+    _state_saved = True
+    tmp_path = STATE_FILE.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        await context.storage_state(path=str(tmp_path))
+        os.replace(tmp_path, STATE_FILE)
+    except Exception as e:
+        print(f"  ⚠️ Could not save {STATE_FILE}: {e}")
 
-                # small delay to avoid too-fast requests
-                time.sleep(0.6)
 
-        finally:
-            # Ensure we close context and browser
+async def _open_search(page, deadline: float):
+    """Load the search SPA in this tab and wait until the search input is usable."""
+    await page.goto(URL, wait_until="domcontentloaded", timeout=_remaining_ms(deadline, 30000))
+    await page.wait_for_selector(INPUT_SELECTOR, timeout=_remaining_ms(deadline, 10000))
+
+
+async def _reset_search(page, deadline: float) -> bool:
+    """Return the tab to a clean search view after a query, reloading only if needed.
+
+    Tries in-page history first so the SPA bundle isn't fetched again; falls back
+    to a full load when stale results are still showing. Returns False if the tab
+    could not be made ready (the next row will retry the load). Waits draw from the
+    deadline of the row that was just searched.
+    """
+    try:
+        await page.go_back(wait_until="domcontentloaded", timeout=_remaining_ms(deadline, 10000))
+        stale = page.locator(f"{RESULT_LABEL_SELECTOR}:has-text('Prime Award Results'), {NO_RESULTS_SELECTOR}")
+        if await page.locator(INPUT_SELECTOR).is_visible() and await stale.count() == 0:
+            return True
+    except Exception:
+        pass
+
+    try:
+        await _open_search(page, deadline)
+        return True
+    except Exception as e:
+        print(f"  ⚠️ Could not reset search page: {e}")
+        return False
+
+
+def _remaining_ms(deadline: float, cap_ms: int) -> int:
+    """Timeout for the next Playwright call: cap_ms, or less if the row budget is nearly spent."""
+    # Playwright treats timeout=0 as "wait forever", so never go below 1ms
+    return max(1, min(cap_ms, int((deadline - time.monotonic()) * 1000)))
+
+
+async def _fill_query(page, company: str, deadline: float):
+    """Replace the search input's text with company and wait until the SPA sees it."""
+    # Clear whatever the previous row left behind
+    try:
+        await page.fill(INPUT_SELECTOR, "", timeout=_remaining_ms(deadline, 5000))
+    except Exception:
+        pass
+
+    # Fill the input (more reliable than clipboard)
+    try:
+        await page.fill(INPUT_SELECTOR, company, timeout=_remaining_ms(deadline, 5000))
+    except Exception:
+        # fallback: focus + type
+        try:
+            await page.click(INPUT_SELECTOR, timeout=_remaining_ms(deadline, 3000))
+        except Exception:
             try:
-                context.close()
+                await page.focus(INPUT_SELECTOR)
             except Exception:
                 pass
+        # select-all then type
+        try:
+            await page.keyboard.press("Control+A")
+        except Exception:
+            # mac users might need Meta
             try:
-                browser.close()
+                await page.keyboard.press("Meta+A")
             except Exception:
                 pass
+        await page.keyboard.type(company, delay=30)
+
+    # Make sure the SPA sees the new value before submitting (replaces a fixed sleep)
+    try:
+        await page.wait_for_function("([sel, value]) => document.querySelector(sel)?.value === value",
+                                     arg=[INPUT_SELECTOR, company], timeout=_remaining_ms(deadline, 2000))
+    except PlaywrightTimeoutError:
+        pass
+
+
+async def _submit_query(page, deadline: float):
+    """Submit the query currently in the search input."""
+    # Press Enter to reveal the Submit button (per page behavior)
+    try:
+        await page.keyboard.press("Enter")
+    except Exception:
+        pass
+
+    # If Submit appears, click it; otherwise assume Enter triggered results directly
+    try:
+        await page.wait_for_selector(SUBMIT_SELECTOR, timeout=_remaining_ms(deadline, 6000))
+        try:
+            await page.click(SUBMIT_SELECTOR, timeout=_remaining_ms(deadline, 8000))
+            print("  🔘 Submit clicked.")
+        except PlaywrightTimeoutError:
+            print("  ⚠️ Submit appeared but wasn't clickable.")
+    except PlaywrightTimeoutError:
+        print("  ℹ️ Submit did not appear after Enter (maybe results loaded directly).")
+
+
+async def _search_company(page, company: str, deadline: float):
+    """Run one search on an already-loaded search page and return "True"/"False" (or UNDETERMINED).
+
+    All waits share the row's deadline so a hung page can't stall the run.
+    """
+    # Wait for input
+    try:
+        await page.wait_for_selector(INPUT_SELECTOR, timeout=_remaining_ms(deadline, 10000))
+    except PlaywrightTimeoutError:
+        print("  ⚠️ Search input not found on page -> undetermined")
+        return UNDETERMINED
+
+    await _fill_query(page, company, deadline)
+
+    # Submitting makes the SPA fetch the same counts endpoint the API path uses; read the
+    # answer straight from that XHR instead of waiting for the DOM to render it. Only the
+    # request carrying this company counts: a page-load or previous-row reply may still land.
+    response = None
+    try:
+        async with page.expect_response(
+                lambda r: API_COUNT_PATH in r.url and r.status == 200 and _request_mentions(r.request, company),
+                timeout=_remaining_ms(deadline, 15000)) as response_info:
+            await _submit_query(page, deadline)
+        response = await response_info.value
+    except PlaywrightTimeoutError:
+        print("  ⚠️ Search API response not seen; checking the page instead")
+
+    if response is not None:
+        try:
+            status_value = _status_from_counts(await response.json())
+            print(f"  {'✅' if status_value == 'True' else '❌'} Search API counts -> {status_value}")
+            return status_value
+        except Exception as e:
+            print(f"  ⚠️ Could not read search API response ({e}); checking the page instead")
+
+    # Fallback: wait for either success or no-results (single bounded wait, whichever shows up first)
+    status_value = UNDETERMINED
+    try:
+        outcome = page.locator(f"{RESULT_LABEL_SELECTOR}, {NO_RESULTS_SELECTOR}")
+        await outcome.first.wait_for(state="visible", timeout=_remaining_ms(deadline, 8000))
+
+        result_label = page.locator(RESULT_LABEL_SELECTOR)
+        if await result_label.count() > 0:
+            # verify text
+            try:
+                label_text = (await result_label.first.inner_text(timeout=_remaining_ms(deadline, 2000))).strip()
+            except Exception:
+                label_text = ""
+            if "Prime Award Results" in label_text:
+                status_value = "True"
+                print("  ✅ Results found -> True")
+            else:
+                print(f"  ℹ️ Results label found but text != 'Prime Award Results' ({label_text!r}) -> undetermined")
+        else:
+            status_value = "False"
+            print("  ❌ No results message -> False")
+    except PlaywrightTimeoutError:
+        print("  ⚠️ Neither result-label nor no-results detected -> undetermined")
+    except Exception as e:
+        print(f"  ❗ Unexpected error while checking results: {e} -> undetermined")
+
+    return status_value
+
+
+async def _launch_browser(playwright, headless: bool, browser_name: str, chrome_args=None):
+    """Launch the requested engine; Chromium gets CHROMIUM_ARGS unless chrome_args overrides them.
+
+    Playwright's own SIGINT/SIGTERM handling is off: Ctrl+C reaches the whole process group,
+    and the browser must stay up so in-flight rows finish through the interrupt flag.
+    """
+    browser_launcher = {
+        "chromium": playwright.chromium,
+        "firefox": playwright.firefox,
+        "webkit": playwright.webkit
+    }.get(browser_name.lower(), playwright.chromium)
+    launch_options = {"headless": headless, "handle_sigint": False, "handle_sigterm": False}
+    if browser_launcher is playwright.chromium:
+        launch_options["args"] = CHROMIUM_ARGS if chrome_args is None else chrome_args
+    return await browser_launcher.launch(**launch_options)
+
+
+async def _start_worker_browser(headless: bool, browser_name: str, chrome_args=None):
+    """Start Playwright and launch the browser this worker keeps for its whole lifetime.
+
+    chrome_args overrides CHROMIUM_ARGS; other engines ignore it.
+    """
+    global _playwright, _browser
+    _playwright = await async_playwright().start()
+    _browser = await _launch_browser(_playwright, headless, browser_name, chrome_args)
+
+
+async def _stop_worker_browser():
+    """Close every warm tab, then the browser and Playwright itself."""
+    for tab in _worker_tabs:
+        try:
+            await tab["context"].close()
+        except Exception:
+            pass
+    _worker_tabs.clear()
+    try:
+        await _browser.close()
+    except Exception:
+        pass
+    try:
+        await _playwright.stop()
+    except Exception:
+        pass
+
+
+def _close_worker():
+    """Finalizer run when the pool retires this worker process."""
+    if _worker_loop is None or _worker_loop.is_closed():
+        return
+    try:
+        _worker_loop.run_until_complete(_stop_worker_browser())
+    finally:
+        _worker_loop.close()
+
+
+async def _new_tab():
+    """Open a fresh context + page on the worker's browser."""
+    context = await _new_context(_browser)
+    page = await context.new_page()
+    return {"context": context, "page": page, "ready": False, "rows": 0}
+
+
+async def _search_in_tab(tab, company: str, deadline: float):
+    """Search company in a warm tab, recycling its context or (re)loading the SPA first if needed."""
+    # Closing the context releases the Request/Response objects Playwright accumulates
+    if tab["rows"] >= CONTEXT_RECYCLE:
+        try:
+            await tab["context"].close()
+        except Exception:
+            pass
+        tab.update(await _new_tab())
+
+    if not tab["ready"]:
+        try:
+            await _open_search(tab["page"], deadline)
+            tab["ready"] = True
+        except Exception as e:
+            print(f"  ❗ Unexpected navigation error: {e} -> undetermined")
+            return UNDETERMINED
+
+        # First good load in this worker: persist state for later contexts and runs
+        await _save_storage_state(tab["context"])
+
+    status_value = await _search_company(tab["page"], company, deadline)
+    tab["rows"] += 1
+    return status_value
+
+
+async def _process_chunk_async(companies, shard_id: int, concurrency: int):
+    """Search this chunk's company names with up to `concurrency` warm tabs on the worker's event loop."""
+    results = []
+
+    row_queue = asyncio.Queue()
+    for company in companies:
+        row_queue.put_nowait(company)
+
+    def record(company, status_value):
+        results.append((company, status_value))
+        if _result_queue is not None:
+            _result_queue.put((company, status_value))
+
+    async def tab_worker(tab):
+        # Each tab loads the SPA once and then keeps re-using it for new queries, across chunks.
+        # Tabs own their context so it can be recycled without disturbing the others.
+        while not interrupted:
+            try:
+                company = row_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+
+            print(f"[w{shard_id}] Searching: {company!r}")
+
+            # One budget for the whole row: recycling, loading, searching and resetting the tab.
+            # The hard stop covers steps without their own timeout (e.g. typing, context setup).
+            deadline = time.monotonic() + ROW_BUDGET_SECONDS
+            try:
+                status_value = await asyncio.wait_for(_search_in_tab(tab, company, deadline),
+                                                      timeout=ROW_BUDGET_SECONDS + 5)
+            except asyncio.TimeoutError:
+                print(f"  ⚠️ Row exceeded {ROW_BUDGET_SECONDS}s budget -> undetermined")
+                status_value = UNDETERMINED
+                tab["ready"] = False
+            except Exception as e:
+                # Closed target, crashed tab, destroyed execution context...: give up on this row
+                # and rebuild the tab's context before the next one
+                print(f"  ❗ Tab error: {e} -> undetermined")
+                status_value = UNDETERMINED
+                tab["ready"] = False
+                tab["rows"] = CONTEXT_RECYCLE
+            record(company, status_value)
+            if tab["ready"]:
+                tab["ready"] = await _reset_search(tab["page"], deadline)
+
+    # Top up the warm tab pool, then let every tab drain the shared row queue
+    wanted = max(1, min(concurrency, len(companies)))
+    while len(_worker_tabs) < wanted:
+        _worker_tabs.append(await _new_tab())
+
+    # return_exceptions keeps gather waiting for every tab: none may outlive this chunk and
+    # wake up on the persistent loop while the next chunk drives the same pages
+    for outcome in await asyncio.gather(*[tab_worker(tab) for tab in _worker_tabs[:wanted]],
+                                        return_exceptions=True):
+        if isinstance(outcome, BaseException):
+            print(f"[w{shard_id}] ❗ Tab stopped early: {outcome}")
+    if interrupted:
+        print(f"[w{shard_id}] Stopped due to interrupt request.")
+
+    return results
+
+
+def process_chunk(companies, shard_id: int, concurrency: int = 1):
+    """Pool task: search every name in companies with this worker's warm browser.
+
+    Each result is also pushed onto the results queue so the parent can persist
+    progress while the chunk is still running. Returns the list of (company, status).
+    """
+    if _launch_error is not None:
+        raise RuntimeError(f"Browser failed to start: {_launch_error}")
+    return _worker_loop.run_until_complete(_process_chunk_async(companies, shard_id, concurrency))
+
+
+def _open_cache(cache_path: Path):
+    """Open (creating if needed) the on-disk (search URL, name) -> status cache shared across runs."""
+    conn = sqlite3.connect(cache_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # Answers depend on the saved search's filters, so entries are keyed by URL too;
+    # a table from before that can't tell which search its answers came from
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(cache)")]
+    if columns and "url" not in columns:
+        conn.execute("DROP TABLE cache")
+    conn.execute("CREATE TABLE IF NOT EXISTS cache "
+                 "(url TEXT, name TEXT, status TEXT, ts INTEGER, PRIMARY KEY (url, name))")
+    conn.commit()
+    return conn
+
+
+def _cache_lookup(conn, names, ttl_days):
+    """Return {name: status} for names already answered for URL (and not older than ttl_days)."""
+    min_ts = int(time.time() - ttl_days * 86400) if ttl_days is not None else 0
+    hits = {}
+    for name in names:
+        row = conn.execute("SELECT status FROM cache WHERE url = ? AND name = ? AND ts >= ?",
+                           (URL, name, min_ts)).fetchone()
+        if row is not None:
+            hits[name] = row[0]
+    return hits
+
+
+def _cache_store(conn, name: str, status_value: str):
+    conn.execute("INSERT OR REPLACE INTO cache (url, name, status, ts) VALUES (?, ?, ?, ?)",
+                 (URL, name, status_value, int(time.time())))
+
+
+def _status_from_counts(data) -> str:
+    """Map a spending_by_award_count response to "True" if any award type has results."""
+    counts = data.get("results") or {}
+    return "True" if any((count or 0) > 0 for count in counts.values()) else "False"
+
+
+def _payload_mentions(data, text: str) -> bool:
+    """True if any string value in a JSON payload is the search text."""
+    if isinstance(data, str):
+        return data.strip().lower() == text.lower()
+    if isinstance(data, dict):
+        return any(_payload_mentions(value, text) for value in data.values())
+    if isinstance(data, list):
+        return any(_payload_mentions(value, text) for value in data)
+    return False
+
+
+def _request_mentions(request, text: str) -> bool:
+    """True if a Playwright request's JSON body carries the search text."""
+    try:
+        return _payload_mentions(request.post_data_json, text)
+    except Exception:
+        return False
+
+
+def _fill_payload(template, probe: str, company: str):
+    """Copy a captured payload with every occurrence of the probe name replaced by company."""
+    if isinstance(template, str):
+        return company if template.strip().lower() == probe.lower() else template
+    if isinstance(template, dict):
+        return {key: _fill_payload(value, probe, company) for key, value in template.items()}
+    if isinstance(template, list):
+        return [_fill_payload(value, probe, company) for value in template]
+    return template
+
+
+async def _capture_count_payload(probe: str, headless: bool, browser_name: str, chrome_args=None):
+    """Run one search in a throwaway browser and return the counts request body the SPA sent."""
+    async with async_playwright() as p:
+        browser = await _launch_browser(p, headless, browser_name, chrome_args)
+        try:
+            page = await (await _new_context(browser)).new_page()
+            await _open_search(page, time.monotonic() + ROW_BUDGET_SECONDS)
+            deadline = time.monotonic() + ROW_BUDGET_SECONDS
+            await _fill_query(page, probe, deadline)
+            async with page.expect_request(
+                    lambda r: API_COUNT_PATH in r.url and _request_mentions(r, probe),
+                    timeout=_remaining_ms(deadline, 15000)) as request_info:
+                await _submit_query(page, deadline)
+            return (await request_info.value).post_data_json
+        finally:
+            await browser.close()
+
+
+def _load_count_payload(probe: str, headless: bool, browser_name: str, chrome_args=None):
+    """Return {"probe", "payload"} for the API path, capturing and saving it to PAYLOAD_FILE if needed.
+
+    Returns None when the SPA's request couldn't be captured.
+    """
+    if PAYLOAD_FILE.exists():
+        try:
+            saved = json.loads(PAYLOAD_FILE.read_text())
+            if saved.get("url") == URL and saved.get("probe") and saved.get("payload"):
+                return saved
+        except (OSError, ValueError) as e:
+            print(f"  ⚠️ Ignoring unreadable {PAYLOAD_FILE}: {e}")
+
+    print(f"Capturing the search request the SPA sends (probe: {probe!r})...")
+    try:
+        payload = asyncio.run(_capture_count_payload(probe, headless, browser_name, chrome_args))
+    except Exception as e:
+        print(f"  ⚠️ Could not capture the SPA's search request: {e}")
+        return None
+
+    saved = {"url": URL, "probe": probe, "payload": payload}
+    try:
+        PAYLOAD_FILE.write_text(json.dumps(saved, indent=2))
+    except OSError as e:
+        print(f"  ⚠️ Could not save {PAYLOAD_FILE}: {e}")
+    return saved
+
+
+async def _search_api(companies, template, on_result):
+    """Answer companies straight from the USASpending API, calling on_result as each reply lands.
+
+    template is the captured SPA request from _load_count_payload(). Returns the names
+    that couldn't be answered (HTTP/network errors) so they can fall back to the browser.
+    """
+    failed = []
+    limits = httpx.Limits(max_connections=API_MAX_CONNECTIONS)
+    # Requests wait on the semaphore rather than in httpx's pool, so no pool timeout applies
+    timeout = httpx.Timeout(ROW_BUDGET_SECONDS, pool=None)
+    semaphore = asyncio.Semaphore(API_MAX_CONNECTIONS)
+
+    async with httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=limits, timeout=timeout) as client:
+        async def search_one(company):
+            payload = _fill_payload(template["payload"], template["probe"], company)
+            for attempt in range(API_RETRIES):
+                if interrupted:
+                    return
+                last_attempt = attempt == API_RETRIES - 1
+                delay = 2 ** attempt
+                try:
+                    async with semaphore:
+                        resp = await client.post(API_URL, json=payload)
+                    resp.raise_for_status()
+                    on_result(company, _status_from_counts(resp.json()))
+                    return
+                except httpx.HTTPStatusError as e:
+                    # Rate limits and server errors are transient; anything else won't change on retry
+                    code = e.response.status_code
+                    if last_attempt or (code != 429 and code < 500):
+                        print(f"  ⚠️ API error for {company!r}: {e}")
+                        break
+                    retry_after = e.response.headers.get("Retry-After", "")
+                    if retry_after.isdigit():
+                        delay = int(retry_after)
+                except httpx.TransportError as e:
+                    # Timeouts, dropped connections, ...
+                    if last_attempt:
+                        print(f"  ⚠️ API error for {company!r}: {e}")
+                        break
+                except (httpx.HTTPError, ValueError) as e:
+                    print(f"  ⚠️ API error for {company!r}: {e}")
+                    break
+                await asyncio.sleep(delay)
+            failed.append(company)
+
+        await asyncio.gather(*[search_one(company) for company in companies])
+
+    return failed
+
+
+def _search_in_pool(companies, workers: int, concurrency: int, headless: bool, browser_name: str, on_result,
+                    chrome_args=None):
+    """Fan companies out to browser worker processes, calling on_result(company, status) as answers arrive.
+
+    Returns the merged {company: status} reported by the workers once they finish.
+    """
+    # Split names into contiguous chunks; workers keep their browser between chunks
+    workers = max(1, min(workers, len(companies)))
+    chunk_size = max(1, min(CHUNK_SIZE, -(-len(companies) // workers)))
+    chunks = [companies[i:i + chunk_size] for i in range(0, len(companies), chunk_size)]
+    tasks = [(chunk, shard_id, concurrency) for shard_id, chunk in enumerate(chunks)]
+
+    result_queue = multiprocessing.Queue()
+    merged = {}
+
+    # Workers install their own handlers in _init_worker; the parent's handler (see run)
+    # only sets the flag, which we forward so the shards wind down after their current row.
+    with multiprocessing.Pool(processes=workers, initializer=_init_worker,
+                              initargs=(result_queue, headless, browser_name, chrome_args)) as pool:
+        pending = pool.starmap_async(process_chunk, tasks)
+        interrupted_at = None
+
+        # The parent acts as the single writer: apply results as they stream in
+        while not pending.ready() or not result_queue.empty():
+            if interrupted and interrupted_at is None:
+                # A SIGTERM to the parent (kill <pid>) never reaches the workers on its own
+                interrupted_at = time.monotonic()
+                for proc in pool._pool:
+                    try:
+                        os.kill(proc.pid, signal.SIGINT)
+                    except ProcessLookupError:
+                        pass
+            elif interrupted_at is not None and time.monotonic() - interrupted_at > INTERRUPT_GRACE_SECONDS:
+                print("⚠️  Workers did not stop in time; terminating them.")
+                pool.terminate()
+                return merged
+
+            try:
+                company, status_value = result_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if company is None:
+                # A worker couldn't launch its browser (see _init_worker)
+                pool.terminate()
+                raise RuntimeError(f"Browser failed to start: {status_value}")
+            on_result(company, status_value)
+
+        # Merge the authoritative per-shard results (covers anything the queue missed)
+        for shard_results in pending.get():
+            merged.update(shard_results)
+
+        # Let workers exit normally so their finalizers close the browsers
+        pool.close()
+        pool.join()
+
+    return merged
+
+
+def run(input_csv: Path, output_csv: Path, column: str, headless: bool, browser_name: str, workers: int = 1,
+        concurrency: int = 1, cache_path: Path = None, cache_ttl_days: float = None, chrome_args=None,
+        browser_only: bool = False):
+    global interrupted
+
+    # Load CSV once; dtype=str with the C engine keeps every copied-through value verbatim
+    df = pd.read_csv(input_csv, dtype=str)
+    if column not in df.columns:
+        raise RuntimeError(f"CSV must contain a '{column}' column (columns found: {list(df.columns)})")
+
+    # Ensure a status column exists
+    if "status" not in df.columns:
+        df["status"] = ""
+
+    # Normalise names once up front; empty names are False without touching the browser
+    df[column] = df[column].fillna("").astype(str).str.strip()
+    names = df[column]
+    empty_mask = names == ""
+    df.loc[empty_mask, "status"] = "False"
+    if empty_mask.any():
+        print(f"{int(empty_mask.sum())} rows with empty {column!r} -> False")
+
+    # Search each distinct name once and fan the answer back out to every matching row.
+    # Statuses live in a plain list written by position and assigned to df only on flush;
+    # rows whose name hasn't been answered yet keep their previous status.
+    positions = names.groupby(names, sort=False).indices
+    positions.pop("", None)
+    unique = list(positions)
+    statuses = df["status"].tolist()
+    name_to_status = {}
+
+    def set_status(company, status_value):
+        name_to_status[company] = status_value
+        for pos in positions[company]:
+            statuses[pos] = status_value
+
+    def apply_statuses():
+        df["status"] = statuses
+
+    # Names answered by a previous run don't need the browser at all
+    cache = _open_cache(cache_path) if cache_path is not None else None
+    if cache is not None:
+        for company, status_value in _cache_lookup(cache, unique, cache_ttl_days).items():
+            set_status(company, status_value)
+    to_search = [name for name in unique if name not in name_to_status]
+    print(f"{len(df)} rows, {len(unique)} unique {column!r} values, "
+          f"{len(unique) - len(to_search)} cached, {len(to_search)} to search.")
+
+    # register signal handler for graceful shutdown
+    signal.signal(signal.SIGINT, _signal_handler)
+    signal.signal(signal.SIGTERM, _signal_handler)
+
+    # CSV rewrites happen on a background thread so searches don't wait on disk.
+    # Every snapshot is a full rewrite, so dropping one when the queue is full is safe.
+    snapshots = queue.Queue(maxsize=4)
+    writer = threading.Thread(target=_csv_writer, args=(snapshots, output_csv), daemon=True)
+    writer.start()
+
+    rows_since_flush = 0
+
+    def on_result(company, status_value):
+        nonlocal rows_since_flush
+        # Failed searches read as False in the CSV but stay out of the cache
+        set_status(company, "False" if status_value is UNDETERMINED else status_value)
+        if cache is not None and status_value is not UNDETERMINED:
+            _cache_store(cache, company, status_value)
+        rows_since_flush += 1
+        if rows_since_flush >= FLUSH_EVERY or interrupted:
+            apply_statuses()
+            try:
+                snapshots.put_nowait(df.copy(deep=False))
+            except queue.Full:
+                pass
+            if cache is not None:
+                cache.commit()
+            rows_since_flush = 0
+
+    try:
+        if to_search and not browser_only:
+            template = _load_count_payload(to_search[0], headless, browser_name, chrome_args)
+            if template is None:
+                print("Searching every name through the browser instead of the API.")
+            else:
+                try:
+                    to_search = asyncio.run(_search_api(to_search, template, on_result))
+                except Exception as e:
+                    print(f"  ❗ API search failed: {e}")
+                    to_search = [name for name in to_search if name not in name_to_status]
+                if to_search and not interrupted:
+                    print(f"{len(to_search)} names not answered by the API; falling back to the browser.")
+
+        if to_search and not interrupted:
+            # Don't fork the pool while the writer thread is mid-write (it could hold locks)
+            snapshots.join()
+            for company, status_value in _search_in_pool(to_search, workers, concurrency, headless,
+                                                         browser_name, on_result, chrome_args).items():
+                if company not in name_to_status:
+                    on_result(company, status_value)
+    finally:
+        # Persist whatever is still pending since the last batch flush, then stop the writer
+        apply_statuses()
+        snapshots.put(df)
+        snapshots.put(None)
+        writer.join()
+        if cache is not None:
+            cache.commit()
+            cache.close()
 
     print(f"\nDone. Results written to: {output_csv}")
 
@@ -203,6 +878,19 @@ def parse_args():
     ap.add_argument("--headless", action="store_true", help="Run browser in headless mode.")
     ap.add_argument("--browser", choices=["chromium", "firefox", "webkit"], default="chromium",
                     help="Which browser engine to use (default: chromium).")
+    ap.add_argument("--chrome-args", type=shlex.split, default=None,
+                    help="Replace the default Chromium launch flags, e.g. --chrome-args=\"--disable-gpu --no-sandbox\".")
+    ap.add_argument("--workers", "-w", type=int, default=min(8, os.cpu_count() or 1),
+                    help="Number of browser worker processes (default: min(8, CPU count)).")
+    ap.add_argument("--concurrency", type=int, default=4,
+                    help="Concurrent pages per worker process (default: 4).")
+    ap.add_argument("--cache", type=Path, default=Path("company_status.db"),
+                    help="SQLite file caching name -> status per search URL across runs (default: company_status.db).")
+    ap.add_argument("--no-cache", action="store_true", help="Ignore and don't update the results cache.")
+    ap.add_argument("--cache-ttl-days", type=float, default=None,
+                    help="Re-search cached names older than this many days (default: never expire).")
+    ap.add_argument("--browser-only", action="store_true",
+                    help="Skip the USASpending API and search every name through the browser.")
     return ap.parse_args()
 
 
@@ -215,7 +903,10 @@ if __name__ == "__main__":
 
     try:
         run(input_csv=args.input_csv, output_csv=args.output, column=args.column,
-            headless=args.headless, browser_name=args.browser)
+            headless=args.headless, browser_name=args.browser, workers=args.workers,
+            concurrency=args.concurrency, cache_path=None if args.no_cache else args.cache,
+            cache_ttl_days=args.cache_ttl_days, chrome_args=args.chrome_args,
+            browser_only=args.browser_only)
     except Exception as exc:
         print(f"Fatal error: {exc}")
         raise